@@ -29,12 +29,8 @@ if not os.path.exists(history_file):
     with open(history_file, "w") as f:
         json.dump([], f)
 
-# Socket listener
-def dashboard_listener(host='0.0.0.0', port=9090):
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.bind((host, port))
-    server.listen()
-    print(f"[DASHBOARD LISTENING] on {host}:{port}")
+# Socket listener; accepts connections on the bound server socket
+def dashboard_listener(server):
     while True:
         conn, addr = server.accept()
         with conn:
@@ -57,20 +53,43 @@ def dashboard_listener(host='0.0.0.0', port=9090):
                             history = []
                         history = [*new_data, *history]
                         with open(history_file, "w") as f:
-                            json.dump(history, f, indent=2)
+                            json.dump(history, f, separators=(",", ":"))
                     except json.JSONDecodeError as e:
                         print(f"[ERROR] JSON decode failed: {e}")
             except Exception as e:
                 print(f"[ERROR] Receiving data: {e}")
 
-threading.Thread(target=dashboard_listener, daemon=True).start()
+# Bind on the script thread so a failed bind raises here and is not cached; reruns retry it
+@st.cache_resource
+def start_listener(host='0.0.0.0', port=9090):
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        server.bind((host, port))
+        server.listen()
+    except OSError:
+        server.close()
+        raise
+    print(f"[DASHBOARD LISTENING] on {host}:{port}")
+    listener = threading.Thread(target=dashboard_listener, args=(server,), daemon=True)
+    listener.start()
+    return listener
+
+try:
+    start_listener()
+    listener_error = None
+except OSError as e:
+    listener_error = e
+    st.error(f"Dashboard server could not listen on port 9090: {e}")
 
 # Server control
 col1, col2 = st.columns(2)
 with col1:
     if st.button("🟢 Start Server"):
         st.session_state.server_active = True
-        st.success("Dashboard server started.")
+        if listener_error is None:
+            st.success("Dashboard server started.")
+        else:
+            st.error(f"Dashboard server is not listening: {listener_error}")
 with col2:
     if st.button("🔴 Stop Server"):
         st.session_state.server_active = False
@@ -4,11 +4,18 @@
 # ===----------------------------------------------------------------------===//
 
 import streamlit as st
+import orjson
 import json
 import os
+import re
 import pandas as pd
+import numpy as np
 import threading
+import queue
+import time
 import socket
+import struct
+from collections import deque
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timezone, timedelta
@@ -19,79 +26,316 @@ st.set_page_config(page_title="Oil Well Dashboard with Forecasting", layout="wid
 st_autorefresh(interval=10 * 1000, key="datarefresh")
 st.title("🛢️ Oil Well Production Dashboard with AI Forecasting")
 
-history_file = "oil_well_history.json"
+history_file = "oil_well_history.ndjson"
+legacy_history_file = "oil_well_history.json"  # Newest-first JSON array used before the log
+MAX_HISTORY_RECORDS = 1000
+COMPACT_EVERY_WRITES = 50
+COMPACT_MAX_BYTES = 4 * 1024 * 1024
+SOCKET_RCVBUF_BYTES = 4 * 1024 * 1024
+RECV_CHUNK_BYTES = 65536
+FRAME_HEADER = struct.Struct(">I")
+MAX_FRAME_BYTES = 16 * 1024 * 1024 - 1  # Largest length whose first header byte is 0x00
+CONNECTION_TIMEOUT_SECONDS = 60  # Senders report every few seconds; idle peers are dropped
+WRITE_QUEUE_MAX_MESSAGES = 10000
+PERSIST_BATCH_RECORDS = 100
+PERSIST_BATCH_SECONDS = 0.5
+
+# Numeric well parameters reported by the sensors
+NUMERIC_COLS = ["Oil volume", "Water cut", "Gas volume", "Reservoir pressure",
+                "Dynamic level", "Working hours", "Water volume", "Volume of liquid"]
+
+# Forecast chart columns and the prediction keys they are read from
+FORECAST_PARAMETERS = {
+    'Oil Volume': 'Oil volume',
+    'Water Cut': 'Water cut',
+    'Gas Volume': 'Gas volume',
+    'Reservoir Pressure': 'Reservoir pressure',
+    'Dynamic Level': 'Dynamic level',
+    'Working Hours': 'Working hours',
+    'Water Volume': 'Water volume',
+    'Volume of Liquid': 'Volume of liquid',
+}
 
 if "server_active" not in st.session_state:
     st.session_state.server_active = False
 
+
+# Parse JSON with orjson, falling back to the stdlib parser for the NaN/Infinity literals
+# that Python senders emit by default and orjson rejects
+def parse_json(data):
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        return json.loads(bytes(data))
+
+
+# Start the log from the legacy JSON history, if there is one, the first time it is created
+def import_legacy_history():
+    records = []
+    if os.path.exists(legacy_history_file):
+        try:
+            with open(legacy_history_file, "rb") as f:
+                legacy = parse_json(f.read())
+            for entry in legacy:
+                if isinstance(entry, list):
+                    records.extend(entry)
+                else:
+                    records.append(entry)
+            print(f"🛢️ [IMPORTED] {len(records)} records from {legacy_history_file}")
+        except (OSError, ValueError) as e:
+            print(f"❌ [ERROR] Importing legacy oil well history: {e}")
+            records = []
+    tmp_file = history_file + ".tmp"
+    with open(tmp_file, "wb") as f:
+        # The legacy array is newest first; the log is oldest first
+        f.write(b"".join(orjson.dumps(record) + b"\n"
+                         for record in reversed(records[:MAX_HISTORY_RECORDS])))
+    os.replace(tmp_file, history_file)
+
+
 if not os.path.exists(history_file):
-    with open(history_file, "w") as f:
-        json.dump([], f)
+    import_legacy_history()
+
+# Received batches waiting to be written by the persistence worker
+write_queue = queue.Queue(maxsize=WRITE_QUEUE_MAX_MESSAGES)
+dropped_lock = threading.Lock()
+dropped_messages = 0
+
+
+# Newest-first ring buffer of the last 1000 records, mirrored by the log
+class SharedHistory:
+    def __init__(self):
+        self.records = deque(maxlen=MAX_HISTORY_RECORDS)
+        self.lock = threading.Lock()
+        self.version = 0  # Bumped on every change; keys the dashboard caches
+
+
+# Fill a new in-memory history from the records already in the log
+def seed_history(shared):
+    with open(history_file, "rb") as f:
+        lines = deque(f, maxlen=MAX_HISTORY_RECORDS)
+    records = []
+    for line in lines:
+        # Lines torn by a crash mid-append do not decode; skip them rather than lose the rest
+        try:
+            records.append(orjson.loads(line))
+        except orjson.JSONDecodeError as e:
+            print(f"❌ [ERROR] Skipping unreadable history line: {e}")
+    with shared.lock:
+        shared.records.extendleft(records)
+        shared.version += 1
+
+
+# Streamlit re-executes this script on every rerun; cache_resource keeps one history
+# per process, shared by the listener threads and all reruns. It is seeded from the log
+# once here, so the dashboard shows stored records even when another process owns the port.
+@st.cache_resource
+def get_shared_history():
+    shared = SharedHistory()
+    try:
+        seed_history(shared)
+    except Exception as e:
+        print(f"❌ [ERROR] Loading oil well history: {e}")
+    return shared
 
 
-# Socket listener for oil well data
-def dashboard_listener(host='0.0.0.0', port=9090):
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    server.bind((host, port))
-    server.listen()
-    print(f"🛢️ [OIL WELL DASHBOARD LISTENING] on {host}:{port}")
+history = get_shared_history()
 
-    while True:
-        conn, addr = server.accept()
-        with conn:
-            try:
-                buffer = ""
-                while True:
-                    chunk = conn.recv(8192).decode()  # Larger buffer for oil well data
-                    if not chunk:
-                        break
-                    buffer += chunk
-
-                if buffer:
-                    try:
-                        data = json.loads(buffer)
-
-                        # Handle both single records and batch data
-                        if isinstance(data, dict) and "well_data" in data:
-                            new_data = data["well_data"]  # Extract well data from summary
-                        elif isinstance(data, list):
-                            new_data = data
-                        else:
-                            new_data = [data]
 
-                        print(f"🛢️ [RECEIVED] from {addr}: {len(new_data)} oil well records")
+# Rewrite the append-only log with only the records held in memory; caller holds history.lock
+def compact_history():
+    records = list(history.records)
+    tmp_file = history_file + ".tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(b"".join(orjson.dumps(record) + b"\n" for record in reversed(records)))
+    os.replace(tmp_file, history_file)
 
-                        # Count records with forecasts
-                        forecast_count = sum(1 for record in new_data if record.get("forecast"))
-                        if forecast_count > 0:
-                            print(f"🔮 [FORECASTS] Received {forecast_count} records with forecasts")
 
-                        # Load existing history
-                        if os.path.exists(history_file):
-                            with open(history_file, "r") as f:
-                                history = json.load(f)
-                        else:
-                            history = []
+# Hand one decoded payload to the persistence worker
+def store_well_data(data, addr):
+    global dropped_messages
+
+    # Handle both single records and batch data
+    if isinstance(data, dict) and "well_data" in data:
+        new_data = data["well_data"]  # Extract well data from summary
+    elif isinstance(data, list):
+        new_data = data
+    else:
+        new_data = [data]
+
+    # Flatten nested batches so the log holds exactly one record per line
+    records = []
+    for entry in new_data:
+        if isinstance(entry, list):
+            records.extend(entry)
+        else:
+            records.append(entry)
+    new_data = records
+
+    print(f"🛢️ [RECEIVED] from {addr}: {len(new_data)} oil well records")
+
+    # Count records with forecasts
+    forecast_count = sum(1 for record in new_data if record.get("forecast"))
+    if forecast_count > 0:
+        print(f"🔮 [FORECASTS] Received {forecast_count} records with forecasts")
+
+    try:
+        write_queue.put_nowait(new_data)
+    except queue.Full:
+        with dropped_lock:
+            dropped_messages += 1
+            print(f"❌ [ERROR] Write queue full, dropped {len(new_data)} records "
+                  f"({dropped_messages} messages dropped so far)")
+
+
+# Write queued records to the history log in batches of up to 100 records or 0.5 seconds
+def persistence_worker():
+    writes_since_compaction = 0
+    while True:
+        batch = list(write_queue.get())
+        deadline = time.monotonic() + PERSIST_BATCH_SECONDS
+        while len(batch) < PERSIST_BATCH_RECORDS:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.extend(write_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        try:
+            # Hold the lock across the file writes so a Reset cannot land between
+            # updating the history and writing it, and be undone by the write
+            with history.lock:
+                history.records.extendleft(batch)
+                history.version += 1
+
+                # Append new records to the log (one compact JSON record per line, oldest first)
+                with open(history_file, "ab") as f:
+                    f.write(b"".join(orjson.dumps(record) + b"\n" for record in batch))
+
+                # Periodically trim the log to the last 1000 records
+                writes_since_compaction += 1
+                if (writes_since_compaction >= COMPACT_EVERY_WRITES
+                        or os.path.getsize(history_file) > COMPACT_MAX_BYTES):
+                    compact_history()
+                    writes_since_compaction = 0
+        except Exception as e:
+            print(f"❌ [ERROR] Writing oil well history: {e}")
+
+
+# Fill the whole view from the socket; False if the peer closed first
+def recv_exact(conn, view):
+    received = 0
+    while received < len(view):
+        count = conn.recv_into(view[received:])
+        if not count:
+            return False
+        received += count
+    return True
+
+
+# Read length-prefixed frames (4-byte big-endian length + JSON) until the peer closes
+def receive_frames(conn, addr):
+    header = bytearray(FRAME_HEADER.size)
+    buffer = bytearray(RECV_CHUNK_BYTES)
+    while recv_exact(conn, memoryview(header)):
+        (length,) = FRAME_HEADER.unpack(header)
+        if length > MAX_FRAME_BYTES:
+            print(f"❌ [ERROR] Frame of {length} bytes from {addr} exceeds limit, closing connection")
+            return
+        if length > len(buffer):
+            buffer = bytearray(length)
+        payload = memoryview(buffer)[:length]
+        if not recv_exact(conn, payload):
+            return
+        try:
+            data = parse_json(payload)
+        except ValueError as e:  # Also covers payloads that are not valid UTF-8
+            print(f"❌ [ERROR] JSON decode failed: {e}")
+            continue
+        store_well_data(data, addr)
+
+
+# Read a single JSON payload sent without framing, terminated by the peer closing
+def receive_unframed(conn, addr):
+    # Collect raw chunks and join once; orjson parses the bytes directly
+    chunks = []
+    size = 0
+    while True:
+        chunk = conn.recv(RECV_CHUNK_BYTES)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > MAX_FRAME_BYTES:
+            print(f"❌ [ERROR] Unframed payload from {addr} exceeds {MAX_FRAME_BYTES} bytes, closing connection")
+            return
+        chunks.append(chunk)
+    payload = b"".join(chunks)
+
+    if payload:
+        try:
+            data = parse_json(payload)
+        except ValueError as e:  # Also covers payloads that are not valid UTF-8
+            print(f"❌ [ERROR] JSON decode failed: {e}")
+            return
+        store_well_data(data, addr)
+
+
+def handle_connection(conn, addr):
+    with conn:
+        try:
+            # Framed senders start with a length whose high byte is zero; JSON never does
+            first_byte = conn.recv(1, socket.MSG_PEEK)
+            if first_byte == b"\x00":
+                receive_frames(conn, addr)
+            elif first_byte:
+                receive_unframed(conn, addr)
+        except Exception as e:
+            print(f"❌ [ERROR] Receiving oil well data: {e}")
+
+
+# Socket listener for oil well data; accepts connections on the bound server socket
+def dashboard_listener(server):
+    # Only the listener that owns the port writes the history log
+    threading.Thread(target=persistence_worker, daemon=True).start()
 
-                        # Add new data to the beginning (newest first)
-                        history = [*new_data, *history]
+    while True:
+        conn, addr = server.accept()
+        # Framed connections stay open, so each one gets its own thread; the timeout
+        # frees the thread when a peer goes quiet without closing
+        conn.settimeout(CONNECTION_TIMEOUT_SECONDS)
+        threading.Thread(target=handle_connection, args=(conn, addr), daemon=True).start()
 
-                        # Keep only last 1000 records to prevent file from growing too large
-                        history = history[:1000]
 
-                        # Save updated history
-                        with open(history_file, "w") as f:
-                            json.dump(history, f, indent=2)
+# Start dashboard listener thread once per process; cache_resource makes reruns reuse it.
+# The socket is bound here on the script thread so a failed bind raises instead of being
+# cached, and the next rerun tries again.
+@st.cache_resource
+def start_listener(host='0.0.0.0', port=9090):
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # Larger kernel receive buffer for batched well data; accepted connections inherit it
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_RCVBUF_BYTES)
+        server.bind((host, port))
+        server.listen()
+    except OSError:
+        server.close()
+        raise
+    print(f"🛢️ [OIL WELL DASHBOARD LISTENING] on {host}:{port}")
 
-                    except json.JSONDecodeError as e:
-                        print(f"❌ [ERROR] JSON decode failed: {e}")
-            except Exception as e:
-                print(f"❌ [ERROR] Receiving oil well data: {e}")
+    listener = threading.Thread(target=dashboard_listener, args=(server,), daemon=True)
+    listener.start()
+    return listener
 
 
-# Start dashboard listener thread
-threading.Thread(target=dashboard_listener, daemon=True).start()
+try:
+    start_listener()
+    listener_error = None
+except OSError as e:
+    listener_error = e
+    st.error(f"❌ Oil Well Dashboard server could not listen on port 9090: {e}")
 
 # Server control
 st.markdown("### 🎛️ Dashboard Control")
@@ -99,15 +343,20 @@ col1, col2, col3 = st.columns(3)
 with col1:
     if st.button("🟢 Start Dashboard"):
         st.session_state.server_active = True
-        st.success("🛢️ Oil Well Dashboard server started on port 9090")
+        if listener_error is None:
+            st.success("🛢️ Oil Well Dashboard server started on port 9090")
+        else:
+            st.error(f"❌ Oil Well Dashboard server is not listening: {listener_error}")
 with col2:
     if st.button("🔴 Stop Dashboard"):
         st.session_state.server_active = False
         st.warning("Dashboard server stopped.")
 with col3:
     if st.button("🧹 Reset Data"):
-        with open(history_file, "w") as f:
-            json.dump([], f)
+        with history.lock:
+            history.records.clear()
+            history.version += 1
+            open(history_file, "w").close()
         st.session_state["cleared"] = True
         st.success("Dashboard data has been reset.")
 
@@ -172,26 +421,125 @@ with st.expander("ℹ️ Oil Well Parameter Ranges & Thresholds"):
         - **Optimal**: 24
         """)
 
+# Status keywords by flag, in priority order; each group is a lookahead so that
+# e.g. "High Critical" still classifies as Critical
+STATUS_RE = re.compile(r"(?=.*(Critical))|(?=.*(Warning|High|Low))|(?=.*(Concerning|Caution))"
+                       r"|(?=.*(Normal|Optimal|Excellent|Healthy))", re.DOTALL)
+STATUS_FLAGS = ["🔴", "🟠", "🟡", "🟢"]
+
+
+# Create status flags for display
+def get_status_flag(status):
+    if isinstance(status, str):
+        match = STATUS_RE.match(status)
+        if match:
+            return STATUS_FLAGS[match.lastindex - 1]
+    return "⚪"
+
+
+# Vectorized get_status_flag over a column of status strings: classify each distinct
+# status once, then map the categorical codes through that lookup table
+def get_status_flags(statuses):
+    categories = pd.Categorical(statuses)
+    flag_lut = np.array([*map(get_status_flag, categories.categories), "⚪"], dtype=object)
+    return np.take(flag_lut, categories.codes)  # Missing statuses have code -1, the trailing "⚪"
+
+
+def format_parameter(df, column, key, unit=""):
+    values = df[column] if column in df else pd.Series(np.nan, index=df.index)
+    statuses = df[f"status_{key}"] if f"status_{key}" in df else pd.Series(np.nan, index=df.index)
+    formatted = (values.astype(str) + unit).where(values.notna(), "N/A")
+    return formatted + " " + get_status_flags(statuses)
+
+
+# Value of one column for one record, or the default when the column or value is missing
+def record_value(df, index, column, default):
+    if column not in df:
+        return default
+    value = df.at[index, column]
+    return default if pd.isna(value) else value
+
+
+# Load history into a DataFrame; the history version is the cache key,
+# so autorefresh reruns reuse the parsed frame until new data arrives
+@st.cache_data(show_spinner=False, max_entries=2)  # Current and previous history version only
+def load_history(version):
+    # Copy the shared records; no disk I/O or JSON parsing on the read path
+    with history.lock:
+        records = list(history.records)
+
+    df = pd.DataFrame(records)
+
+    if not df.empty:
+        # Convert timestamp to local timezone once per history version; later views reuse the typed column
+        df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True, format="ISO8601").dt.tz_convert("Asia/Karachi")
+
+        # Flag records carrying a non-empty forecast once, for all forecast views
+        for column in ("status", "forecast", "alerts"):
+            if column not in df:
+                df[column] = None
+        df["has_forecast"] = df["forecast"].map(bool, na_action="ignore").eq(True)
+
+        # Flatten status and forecast predictions into status_* / pred_* columns
+        status_df = pd.json_normalize(
+            [status if isinstance(status, dict) else {} for status in df["status"]]).add_prefix("status_")
+        pred_df = pd.json_normalize(
+            [(forecast.get("predictions") if isinstance(forecast, dict) else None) or {}
+             for forecast in df["forecast"]]).add_prefix("pred_")
+        df = pd.concat([df, status_df.set_axis(df.index), pred_df.set_axis(df.index)], axis=1)
+
+        # Narrow whole-valued well parameters to the smallest integer dtype. Records missing a
+        # parameter turn its column into float64 with NaN, so those go to a nullable Int dtype;
+        # columns holding fractional values stay float64.
+        for col in NUMERIC_COLS:
+            if col not in df or not pd.api.types.is_numeric_dtype(df[col]):
+                continue
+            values = df[col]
+            if pd.api.types.is_float_dtype(values):
+                if not values.dropna().mod(1).eq(0).all():
+                    continue
+                values = values.astype("Int64")
+            df[col] = pd.to_numeric(values, downcast="integer")
+
+    return df
+
+
+# Build the formatted historical table for the same cache key as load_history
+@st.cache_data(show_spinner=False, max_entries=2)  # Current and previous history version only
+def build_display_table(version):
+    df = load_history(version)
+
+    # Only the last 20 records are shown, so only those are formatted
+    df = df.head(20)
+    display_df = df[["timestamp", "client"]].copy()
+
+    # Format columns with status indicators
+    display_df["Oil Production"] = format_parameter(df, "Oil volume", "oil_volume", " bbl/day")
+    display_df["Water Cut"] = format_parameter(df, "Water cut", "water_cut", "%")
+    display_df["Gas Volume"] = format_parameter(df, "Gas volume", "gas_volume", " MCF")
+    display_df["Pressure"] = format_parameter(df, "Reservoir pressure", "reservoir_pressure", " psi")
+    display_df["Dynamic Level"] = format_parameter(df, "Dynamic level", "dynamic_level", " ft")
+    display_df["Working Hours"] = format_parameter(df, "Working hours", "working_hours", " hrs")
+
+    # Add forecast indicator
+    display_df["Forecast"] = np.where(df["has_forecast"], "🔮 Yes", "❌ No")
+
+    # Rename for display
+    display_df = display_df.rename(columns={"timestamp": "Timestamp", "client": "Well ID"})
+
+    # Add serial numbers (newest = 1)
+    display_df.insert(0, "Record #", range(1, len(display_df) + 1))
+
+    return display_df
+
+
 # Main dashboard display
 if st.session_state.get("server_active", False) and not st.session_state.get("cleared", False):
     try:
-        with open(history_file, "r") as f:
-            data = json.load(f)
-
-        # Flatten nested data structures
-        flattened_data = []
-        for entry in data:
-            if isinstance(entry, list):
-                flattened_data.extend(entry)
-            else:
-                flattened_data.append(entry)
-
-        df = pd.DataFrame(flattened_data)
+        history_version = history.version
+        df = load_history(history_version)
 
         if not df.empty:
-            # Convert timestamp to local timezone
-            df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True).dt.tz_convert("Asia/Karachi")
-
             # Check for recent data
             latest_time = df["timestamp"].max()
             now_local = datetime.now(timezone.utc).astimezone()
@@ -200,61 +548,35 @@ if st.session_state.get("server_active", False) and not st.session_state.get("cl
                 st.warning(
                     "⚠️ No new data received in the last 30 seconds. Oil well sensors may have stopped transmitting.")
 
-            # Create status flags for display
-            def get_status_flag(status):
-                if isinstance(status, str):
-                    if "Critical" in status:
-                        return "🔴"
-                    elif "Warning" in status or "High" in status or "Low" in status:
-                        return "🟠"
-                    elif "Concerning" in status or "Caution" in status:
-                        return "🟡"
-                    elif "Normal" in status or "Optimal" in status or "Excellent" in status or "Healthy" in status:
-                        return "🟢"
-                return "⚪"
-
-            def format_parameter(value, status_dict, key, unit=""):
-                if isinstance(status_dict, dict):
-                    status = status_dict.get(key, "Unknown")
-                    flag = get_status_flag(status)
-                    if pd.isna(value) or value is None:
-                        return f"N/A {flag}"
-                    return f"{value}{unit} {flag}"
-                return f"{value}{unit} ⚪"
-
             # Extract forecast data for analysis
-            forecast_available = df['forecast'].notna().sum()
+            forecast_available = int(df['has_forecast'].sum())
             
             # Forecast Summary Section
             if forecast_available > 0:
                 st.markdown("### 🔮 AI Forecast Summary")
                 
-                latest_forecast = None
-                for _, record in df.iterrows():
-                    if record.get('forecast'):
-                        latest_forecast = record['forecast']
-                        break
+                latest_forecast_index = df['has_forecast'].idxmax()  # Newest record with a forecast
+                latest_forecast = df.at[latest_forecast_index, 'forecast']
                 
                 if latest_forecast and latest_forecast.get('predictions'):
                     col1, col2, col3, col4 = st.columns(4)
                     
-                    predictions = latest_forecast['predictions']
                     forecast_date = latest_forecast.get('forecast_date', 'Unknown')
                     
                     with col1:
-                        predicted_oil = predictions.get('Oil volume', 'N/A')
+                        predicted_oil = record_value(df, latest_forecast_index, 'pred_Oil volume', 'N/A')
                         st.metric("🔮 Tomorrow's Oil Production", 
                                 f"{predicted_oil} bbl/day",
                                 help=f"Forecast for {forecast_date}")
                     
                     with col2:
-                        predicted_water_cut = predictions.get('Water cut', 'N/A')
+                        predicted_water_cut = record_value(df, latest_forecast_index, 'pred_Water cut', 'N/A')
                         st.metric("🔮 Tomorrow's Water Cut", 
                                 f"{predicted_water_cut}%",
                                 help=f"Forecast for {forecast_date}")
                     
                     with col3:
-                        predicted_pressure = predictions.get('Reservoir pressure', 'N/A')
+                        predicted_pressure = record_value(df, latest_forecast_index, 'pred_Reservoir pressure', 'N/A')
                         st.metric("🔮 Tomorrow's Pressure", 
                                 f"{predicted_pressure} psi",
                                 help=f"Forecast for {forecast_date}")
@@ -271,48 +593,43 @@ if st.session_state.get("server_active", False) and not st.session_state.get("cl
             st.markdown("### 📊 Current Well Performance Summary")
 
             if len(df) > 0:
-                latest_record = df.iloc[0]  # Most recent record
+                latest_index = df.index[0]  # Most recent record
 
                 col1, col2, col3, col4 = st.columns(4)
 
                 with col1:
-                    oil_vol = latest_record.get("Oil volume", "N/A")
-                    oil_status = latest_record.get("status", {}).get("oil_volume", "Unknown")
+                    oil_vol = record_value(df, latest_index, "Oil volume", "N/A")
+                    oil_status = record_value(df, latest_index, "status_oil_volume", "Unknown")
                     st.metric("🛢️ Oil Production", f"{oil_vol} bbl/day",
                               help=f"Status: {oil_status}")
 
                 with col2:
-                    water_cut = latest_record.get("Water cut", "N/A")
-                    water_status = latest_record.get("status", {}).get("water_cut", "Unknown")
+                    water_cut = record_value(df, latest_index, "Water cut", "N/A")
+                    water_status = record_value(df, latest_index, "status_water_cut", "Unknown")
                     st.metric("💧 Water Cut", f"{water_cut}%",
                               help=f"Status: {water_status}")
 
                 with col3:
-                    pressure = latest_record.get("Reservoir pressure", "N/A")
-                    pressure_status = latest_record.get("status", {}).get("reservoir_pressure", "Unknown")
+                    pressure = record_value(df, latest_index, "Reservoir pressure", "N/A")
+                    pressure_status = record_value(df, latest_index, "status_reservoir_pressure", "Unknown")
                     st.metric("🏭 Reservoir Pressure", f"{pressure} psi",
                               help=f"Status: {pressure_status}")
 
                 with col4:
-                    overall_health = latest_record.get("status", {}).get("overall_well_health", "Unknown")
+                    overall_health = record_value(df, latest_index, "status_overall_well_health", "Unknown")
                     health_flag = get_status_flag(overall_health)
                     st.metric("🏥 Overall Health", f"{overall_health} {health_flag}")
 
             # Active Alerts (including forecast alerts)
             st.markdown("### 🚨 Active Alerts & Forecast Warnings")
-            recent_alerts = []
-            forecast_alerts = []
-            
-            for _, record in df.head(10).iterrows():  # Check last 10 records
-                alerts = record.get("alerts", [])
-                if alerts:
-                    client = record.get("client", "Unknown")
-                    timestamp = record["timestamp"].strftime("%H:%M:%S")
-                    for alert in alerts:
-                        if "FORECAST" in alert:
-                            forecast_alerts.append(f"**{timestamp}** - {client}: {alert}")
-                        else:
-                            recent_alerts.append(f"**{timestamp}** - {client}: {alert}")
+
+            # One row per alert across the last 10 records
+            alert_rows = df.head(10).explode("alerts").dropna(subset=["alerts"])
+            alert_messages = ("**" + alert_rows["timestamp"].dt.strftime("%H:%M:%S") + "** - "
+                              + alert_rows["client"].astype(str) + ": " + alert_rows["alerts"].astype(str))
+            is_forecast_alert = alert_rows["alerts"].astype(str).str.contains("FORECAST", regex=False)
+            forecast_alerts = alert_messages[is_forecast_alert].tolist()
+            recent_alerts = alert_messages[~is_forecast_alert].tolist()
 
             # Show forecast alerts first
             if forecast_alerts:
@@ -343,31 +660,21 @@ if st.session_state.get("server_active", False) and not st.session_state.get("cl
             if forecast_available > 0:
                 st.markdown("### 🔮 Next-Day Forecast Predictions")
                 
-                # Prepare forecast data for visualization
-                forecast_data = []
-                
-                for _, record in df.head(20).iterrows():
-                    if record.get('forecast') and record['forecast'].get('predictions'):
-                        predictions = record['forecast']['predictions']
-                        forecast_date = record['forecast']['forecast_date']
-                        generated_time = record['timestamp']
-                        
-                        forecast_data.append({
-                            'Generated_At': generated_time,
-                            'Forecast_Date': forecast_date,
-                            'Oil Volume': predictions.get('Oil volume', 0),
-                            'Water Cut': predictions.get('Water cut', 0),
-                            'Gas Volume': predictions.get('Gas volume', 0),
-                            'Reservoir Pressure': predictions.get('Reservoir pressure', 0),
-                            'Dynamic Level': predictions.get('Dynamic level', 0),
-                            'Working Hours': predictions.get('Working hours', 0),
-                            'Water Volume': predictions.get('Water volume', 0),
-                            'Volume of Liquid': predictions.get('Volume of liquid', 0)
-                        })
-                
-                if forecast_data:
-                    forecast_df = pd.DataFrame(forecast_data)
-                    
+                # Prepare forecast data for visualization from the last 20 records
+                recent_df = df.head(20)
+                prediction_cols = [col for col in df.columns if col.startswith('pred_')]
+                recent_df = recent_df[recent_df['has_forecast'] & recent_df[prediction_cols].notna().any(axis=1)]
+
+                forecast_df = pd.DataFrame({
+                    'Generated_At': recent_df['timestamp'],
+                    'Forecast_Date': recent_df['forecast'].str.get('forecast_date'),
+                })
+                for label, key in FORECAST_PARAMETERS.items():
+                    column = f'pred_{key}'
+                    forecast_df[label] = recent_df[column].fillna(0) if column in recent_df else 0
+                forecast_df = forecast_df.reset_index(drop=True)
+
+                if not forecast_df.empty:
                     # Create forecast prediction charts
                     tab1, tab2, tab3 = st.tabs(["🔮 All Forecast Parameters", "🔮 Production Forecasts", "🔮 Operational Forecasts"])
                     
@@ -404,7 +711,7 @@ if st.session_state.get("server_active", False) and not st.session_state.get("cl
                     # Show forecast data table
                     st.markdown("#### 📋 Forecast Predictions Table")
                     display_forecast_df = forecast_df.copy()
-                    display_forecast_df['Generated_At'] = pd.to_datetime(display_forecast_df['Generated_At']).dt.strftime('%Y-%m-%d %H:%M:%S')
+                    display_forecast_df['Generated_At'] = display_forecast_df['Generated_At'].dt.strftime('%Y-%m-%d %H:%M:%S')
                     
                     # Reorder columns for better display
                     column_order = ['Generated_At', 'Forecast_Date', 'Oil Volume', 'Water Cut', 'Gas Volume', 
@@ -420,48 +727,21 @@ if st.session_state.get("server_active", False) and not st.session_state.get("cl
             # Historical Data Table with Forecast Information
             st.markdown("### 📋 Historical Oil Well Data with Forecasts")
 
-            # Prepare display dataframe
-            display_df = df.copy()
-
-            # Format columns with status indicators
-            display_df["Oil Production"] = df.apply(lambda row: format_parameter(
-                row.get("Oil volume"), row.get("status"), "oil_volume", " bbl/day"), axis=1)
-            display_df["Water Cut"] = df.apply(lambda row: format_parameter(
-                row.get("Water cut"), row.get("status"), "water_cut", "%"), axis=1)
-            display_df["Gas Volume"] = df.apply(lambda row: format_parameter(
-                row.get("Gas volume"), row.get("status"), "gas_volume", " MCF"), axis=1)
-            display_df["Pressure"] = df.apply(lambda row: format_parameter(
-                row.get("Reservoir pressure"), row.get("status"), "reservoir_pressure", " psi"), axis=1)
-            display_df["Dynamic Level"] = df.apply(lambda row: format_parameter(
-                row.get("Dynamic level"), row.get("status"), "dynamic_level", " ft"), axis=1)
-            display_df["Working Hours"] = df.apply(lambda row: format_parameter(
-                row.get("Working hours"), row.get("status"), "working_hours", " hrs"), axis=1)
-            
-            # Add forecast indicator
-            display_df["Forecast"] = df.apply(lambda row: "🔮 Yes" if row.get("forecast") else "❌ No", axis=1)
-
-            # Select columns for display
-            table_df = display_df[["timestamp", "client", "Oil Production", "Water Cut",
-                                   "Gas Volume", "Pressure", "Dynamic Level", "Working Hours", "Forecast"]].copy()
-            table_df.columns = ["Timestamp", "Well ID", "Oil Production", "Water Cut",
-                                "Gas Volume", "Pressure", "Dynamic Level", "Working Hours", "Forecast"]
-
-            # Add serial numbers (newest = 1)
-            table_df.insert(0, "Record #", range(1, len(table_df) + 1))
-
-            # Display table with HTML formatting
-            st.markdown(
-                table_df.head(20).to_html(escape=False, index=False),  # Show last 20 records
-                unsafe_allow_html=True
+            table_df = build_display_table(history_version)
+
+            # Display table client-side; height fits all 20 rows (35px each plus header)
+            st.dataframe(
+                table_df,  # Show last 20 records
+                use_container_width=True,
+                hide_index=True,
+                height=(len(table_df) + 1) * 35 + 3
             )
 
             # Real-time Charts
             st.markdown("### 📈 Real-Time Production Charts")
 
             # Prepare chart data
-            chart_df = df.copy()
-            chart_df["timestamp"] = pd.to_datetime(chart_df["timestamp"])
-            chart_df.set_index("timestamp", inplace=True)
+            chart_df = df.head(50).set_index("timestamp")  # Last 50 records
 
             # Select numeric columns for charting
             numeric_cols = ["Oil volume", "Water cut", "Gas volume", "Reservoir pressure",
@@ -475,14 +755,14 @@ if st.session_state.get("server_active", False) and not st.session_state.get("cl
 
                 with tab1:
                     # All parameters chart
-                    chart_data = chart_df[available_cols].head(50)  # Last 50 records
+                    chart_data = chart_df[available_cols]
                     st.line_chart(chart_data)
 
                 with tab2:
                     # Production-focused charts
                     prod_cols = [col for col in ["Oil volume", "Water cut", "Gas volume"] if col in available_cols]
                     if prod_cols:
-                        prod_data = chart_df[prod_cols].head(50)
+                        prod_data = chart_df[prod_cols]
                         st.line_chart(prod_data)
 
                 with tab3:
@@ -490,7 +770,7 @@ if st.session_state.get("server_active", False) and not st.session_state.get("cl
                     ops_cols = [col for col in ["Reservoir pressure", "Dynamic level", "Working hours"] if
                                 col in available_cols]
                     if ops_cols:
-                        ops_data = chart_df[ops_cols].head(50)
+                        ops_data = chart_df[ops_cols]
                         st.line_chart(ops_data)
 
             # Forecast Statistics
@@ -507,10 +787,8 @@ if st.session_state.get("server_active", False) and not st.session_state.get("cl
                 
                 with col3:
                     # Count forecast alerts
-                    total_forecast_alerts = sum(
-                        len([alert for alert in record.get('alerts', []) if 'FORECAST' in alert])
-                        for record in flattened_data
-                    )
+                    all_alerts = df['alerts'].explode().dropna().astype(str)
+                    total_forecast_alerts = int(all_alerts.str.contains('FORECAST', regex=False).sum())
                     st.metric("Total Forecast Alerts", total_forecast_alerts)
 
         else: